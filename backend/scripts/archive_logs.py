@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Hot/Cold Archival of Closed Jobs and Historical Logs
+Moves closed work orders older than a cutoff - together with their moisture
+logs, equipment logs, invoices, invoice line items and payments - out of
+bcs-database.db into per-year archive databases (database/archive/bcs-archive-YYYY.db).
+Large free-form TEXT values (equipment `readings`, notes) are zlib-compressed
+in the archive. A one-row summary per archived job stays in the hot DB
+(archive_summary) so lists and lookups still resolve. Equipment that is still
+deployed stays in the hot DB and follows its job on a later run once retrieved.
+Rows other hot tables still point at (a work order with calendar events or
+change orders, an invoice with documents) also stay hot, so no reference dangles.
+
+The hot DB must use a rollback journal: each year moves in one transaction
+across the hot and archive databases, which SQLite only makes atomic outside WAL.
+
+Old data stays queryable: `query` ATTACHes the archive years and exposes
+TEMP views <table>_all (hot UNION ALL archives, values transparently inflated).
+
+Usage:
+    python3 archive_logs.py archive --before 2024-01-01 --dry-run
+    python3 archive_logs.py archive --before 2024-01-01
+    python3 archive_logs.py query "SELECT * FROM moisture_logs_all WHERE job_id = 12" --years 2022 2023
+    python3 archive_logs.py list
+"""
+
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import sys
+import zlib
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bcs-database.db'))
+ARCHIVE_DIR = os.environ.get('BCS_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'archive'))
+
+CLOSED_WORK_ORDER_STATUSES = ('completed', 'closed', 'cancelled')
+SETTLED_INVOICE_STATUSES = ('paid', 'void', 'cancelled')
+
+# Everything else follows its work order into the archive
+ARCHIVED_TABLES = ('work_orders', 'moisture_logs', 'equipment_logs', 'invoices', 'invoice_line_items', 'payments')
+
+# A work order's closed date is the first of these columns the schema has, in order
+WORK_ORDER_DATE_COLUMNS = ('completion_date', 'completed_date', 'end_date', 'updated_at', 'created_at')
+
+# Only values at least this long are worth compressing
+COMPRESS_MIN_BYTES = 256
+COMPRESS_MAGIC = b'BCSZ'
+
+
+def compress_value(value):
+    if isinstance(value, str) and len(value) >= COMPRESS_MIN_BYTES:
+        packed = COMPRESS_MAGIC + zlib.compress(value.encode('utf-8'), 9)
+        if len(packed) < len(value):
+            return packed
+    return value
+
+
+def inflate_value(value):
+    """SQL function bcs_inflate(): undo compress_value, pass everything else through"""
+    if isinstance(value, bytes) and value.startswith(COMPRESS_MAGIC):
+        return zlib.decompress(value[len(COMPRESS_MAGIC):]).decode('utf-8')
+    return value
+
+
+SUMMARY_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS archive_summary (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  work_order_id INTEGER,
+  work_order_number TEXT,
+  client_id INTEGER,
+  title TEXT,
+  status TEXT,
+  closed_date TEXT,
+  archive_year INTEGER NOT NULL,
+  archive_file TEXT NOT NULL,
+  moisture_log_count INTEGER DEFAULT 0,
+  equipment_log_count INTEGER DEFAULT 0,
+  invoice_count INTEGER DEFAULT 0,
+  invoice_total REAL DEFAULT 0,
+  payment_total REAL DEFAULT 0,
+  archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_archive_summary_work_order ON archive_summary(work_order_id);
+CREATE INDEX IF NOT EXISTS idx_archive_summary_year ON archive_summary(archive_year);
+'''
+
+
+def archive_path(year, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, f'bcs-archive-{year}.db')
+
+
+def archive_years(archive_dir=ARCHIVE_DIR):
+    years = []
+    for path in glob.glob(os.path.join(archive_dir, 'bcs-archive-*.db')):
+        match = re.search(r'bcs-archive-(\d{4})\.db$', path)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+
+def table_exists(conn, table, schema='main'):
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def table_columns(conn, table, schema='main'):
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def year_of(date_text):
+    match = re.match(r'(\d{4})', str(date_text or ''))
+    return int(match.group(1)) if match else None
+
+
+def ensure_archive(conn, year, archive_dir, tables):
+    """Create the year's archive with the hot DB's table definitions and attach it"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = archive_path(year, archive_dir)
+    archive = sqlite3.connect(path)
+    try:
+        for table in tables:
+            if not table_exists(archive, table):
+                create_sql = conn.execute(
+                    "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ).fetchone()[0]
+                archive.execute(create_sql)
+        archive.commit()
+    finally:
+        archive.close()
+    schema = f'archive_{year}'
+    attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+    if schema not in attached:
+        conn.execute('ATTACH DATABASE ? AS ' + schema, (path,))
+    return schema
+
+
+def move_rows(conn, table, schema, where, params):
+    """Copy matching rows into the archive (compressing long text) and delete them from the hot DB"""
+    cursor = conn.execute(f'SELECT * FROM main.{table} WHERE {where}', params)
+    columns = [d[0] for d in cursor.description]
+    rows = [tuple(compress_value(v) for v in row) for row in cursor.fetchall()]
+    if rows:
+        placeholders = ', '.join('?' * len(columns))
+        conn.executemany(
+            f'INSERT OR REPLACE INTO {schema}.{table} ({", ".join(columns)}) VALUES ({placeholders})', rows
+        )
+        conn.execute(f'DELETE FROM main.{table} WHERE {where}', params)
+    return len(rows)
+
+
+def work_order_date_expr(conn):
+    """COALESCE over the date columns this schema's work_orders table actually has"""
+    existing = set(table_columns(conn, 'work_orders'))
+    present = [c for c in WORK_ORDER_DATE_COLUMNS if c in existing]
+    if not present:
+        raise RuntimeError('work_orders has none of the date columns: ' + ', '.join(WORK_ORDER_DATE_COLUMNS))
+    columns = [f'wo.{c}' for c in present]
+    return f'COALESCE({", ".join(columns)})' if len(columns) > 1 else columns[0]
+
+
+def log_job_filter(conn, table, work_order='?', alias=''):
+    """WHERE fragment matching the logs in `table` that belong to `work_order` (a placeholder or column).
+
+    Logs are created by job_id with work_order_id optional (routes/moisture-logs.mjs),
+    so a log belongs to a work order through either column.
+    """
+    col = f'{alias}.' if alias else ''
+    where = f'{col}work_order_id = {work_order}'
+    if 'job_id' in table_columns(conn, table):
+        where = f'({where} OR ({col}work_order_id IS NULL AND {col}job_id = {work_order}))'
+    if table == 'equipment_logs':
+        # Equipment still deployed is active, whatever its job's status
+        where += f' AND {col}retrieved_date IS NOT NULL'
+    return where
+
+
+def referencing_columns(conn, table):
+    """[(hot table, column)] pointing at `table`: declared foreign keys plus the
+    conventional <singular>_id column, since several schemas omit the REFERENCES"""
+    conventional = table[:-1] + '_id'
+    refs = []
+    for (name,) in conn.execute(
+            "SELECT name FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall():
+        if name in (table, 'archive_summary'):
+            continue
+        columns = {fk[3] for fk in conn.execute(f'PRAGMA main.foreign_key_list({name})') if fk[2] == table}
+        if conventional in table_columns(conn, name):
+            columns.add(conventional)
+        refs.extend((name, column) for column in sorted(columns))
+    return refs
+
+
+def referenced_ids(conn, refs, ids, ignore=()):
+    """The subset of `ids` that some hot row in `refs` still points at"""
+    found = set()
+    marks = ', '.join('?' * len(ids))
+    for table, column in refs:
+        if table in ignore or not ids:
+            continue
+        found.update(r[0] for r in conn.execute(
+            f'SELECT DISTINCT {column} FROM main.{table} WHERE {column} IN ({marks})', list(ids)))
+    return found
+
+
+def release_work_order(conn, wo_id, schema, refs):
+    """Move a work order row once nothing in the hot DB references it; returns whether it moved"""
+    if referenced_ids(conn, refs['work_orders'], [wo_id]):
+        return False
+    move_rows(conn, 'work_orders', schema, 'id = ?', (wo_id,))
+    return True
+
+
+def find_closed_jobs(conn, before):
+    """Closed work orders older than the cutoff whose invoices are all settled"""
+    statuses = ', '.join('?' * len(CLOSED_WORK_ORDER_STATUSES))
+    date_expr = work_order_date_expr(conn)
+    sql = f'''
+        SELECT wo.*, {date_expr} AS closed_date
+        FROM work_orders wo
+        WHERE wo.status IN ({statuses}) AND {date_expr} < ?'''
+    params = list(CLOSED_WORK_ORDER_STATUSES) + [before]
+    if table_exists(conn, 'invoices'):
+        settled = ', '.join('?' * len(SETTLED_INVOICE_STATUSES))
+        sql += f'''
+          AND NOT EXISTS (SELECT 1 FROM invoices i
+                          WHERE i.work_order_id = wo.id AND COALESCE(i.status, '') NOT IN ({settled}))'''
+        params += list(SETTLED_INVOICE_STATUSES)
+    if table_exists(conn, 'archive_summary'):
+        # Work orders that stayed hot for their references were archived already
+        sql += '''
+          AND wo.id NOT IN (SELECT work_order_id FROM archive_summary WHERE work_order_id IS NOT NULL)'''
+    cursor = conn.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def archive_job(conn, job, schema, present, refs):
+    """Move one closed job and everything hanging off it; returns its summary row.
+
+    Rows that other hot tables still reference (change orders, calendar events,
+    certificates, documents...) stay in the hot DB so those references resolve:
+    such invoices keep their payments and line items, and the work order row
+    itself moves only once nothing points at it.
+    """
+    wo_id = job['id']
+    counts = {'moisture_logs': 0, 'equipment_logs': 0, 'invoices': 0}
+    invoice_total = payment_total = 0.0
+
+    invoice_ids = []
+    if 'invoices' in present:
+        amount_col = 'total_amount' if 'total_amount' in table_columns(conn, 'invoices') else 'amount'
+        rows = conn.execute(
+            f'SELECT id, COALESCE({amount_col}, 0) FROM main.invoices WHERE work_order_id = ?', (wo_id,)
+        ).fetchall()
+        invoice_total = sum(r[1] for r in rows)
+        pinned = referenced_ids(conn, refs['invoices'], [r[0] for r in rows],
+                                ignore=('invoice_line_items', 'payments'))
+        invoice_ids = [r[0] for r in rows if r[0] not in pinned]
+
+    if 'payments' in present and rows:
+        marks = ', '.join('?' * len(rows))
+        payment_total = conn.execute(
+            f'SELECT COALESCE(SUM(amount), 0) FROM main.payments WHERE invoice_id IN ({marks})', [r[0] for r in rows]
+        ).fetchone()[0]
+    if invoice_ids:
+        marks = ', '.join('?' * len(invoice_ids))
+        if 'invoice_line_items' in present:
+            move_rows(conn, 'invoice_line_items', schema, f'invoice_id IN ({marks})', invoice_ids)
+        if 'payments' in present:
+            move_rows(conn, 'payments', schema, f'invoice_id IN ({marks})', invoice_ids)
+        counts['invoices'] = move_rows(conn, 'invoices', schema, f'id IN ({marks})', invoice_ids)
+
+    for table in ('moisture_logs', 'equipment_logs'):
+        if table in present:
+            where = log_job_filter(conn, table)
+            counts[table] = move_rows(conn, table, schema, where, (wo_id,) * where.count('?'))
+    release_work_order(conn, wo_id, schema, refs)
+
+    return (wo_id, job.get('work_order_number'), job.get('client_id'), job.get('title'), job.get('status'),
+            job['closed_date'], counts['moisture_logs'], counts['equipment_logs'], counts['invoices'],
+            invoice_total, payment_total)
+
+
+def find_leftover_logs(conn, present):
+    """Logs of jobs archived by an earlier run (e.g. equipment retrieved since).
+
+    Returns [(table, year, [(log id, work order id)])].
+    """
+    if not table_exists(conn, 'archive_summary'):
+        return []
+    found = []
+    for table in ('moisture_logs', 'equipment_logs'):
+        if table not in present:
+            continue
+        rows = conn.execute(
+            f"""SELECT DISTINCT s.archive_year, l.id, s.work_order_id FROM main.{table} l
+                JOIN main.archive_summary s
+                  ON s.work_order_id IS NOT NULL AND {log_job_filter(conn, table, 's.work_order_id', 'l')}"""
+        ).fetchall()
+        by_year = {}
+        for year, log_id, wo_id in rows:
+            by_year.setdefault(year, []).append((log_id, wo_id))
+        found.extend((table, year, ids) for year, ids in by_year.items())
+    return found
+
+
+def archive(db_path, before, archive_dir=ARCHIVE_DIR, dry_run=False):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        present = [t for t in ARCHIVED_TABLES if table_exists(conn, t)]
+        if 'work_orders' not in present:
+            raise RuntimeError('work_orders table not found')
+        journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        if journal_mode == 'wal' and not dry_run:
+            # A transaction across attached databases is only atomic with a rollback journal
+            raise RuntimeError('Database is in WAL mode; moves into the archive would not be atomic. '
+                               'Stop the server and run PRAGMA journal_mode=DELETE first.')
+
+        by_year = {}
+        for job in find_closed_jobs(conn, before):
+            by_year.setdefault(year_of(job['closed_date']), {'jobs': [], 'logs': []})['jobs'].append(job)
+        for table, year, logs in find_leftover_logs(conn, present):
+            by_year.setdefault(year, {'jobs': [], 'logs': []})['logs'].append((table, logs))
+        by_year.pop(None, None)
+
+        if by_year and not dry_run:
+            conn.executescript(SUMMARY_SCHEMA)
+        refs = {table: referencing_columns(conn, table) for table in ('work_orders', 'invoices')}
+
+        archived_jobs = 0
+        for year in sorted(by_year):
+            jobs, logs = by_year[year]['jobs'], by_year[year]['logs']
+            print(f'📦 {year}: {len(jobs)} closed jobs' +
+                  ''.join(f', {len(found)} {table} of previously archived jobs' for table, found in logs))
+            archived_jobs += len(jobs)
+            if dry_run:
+                continue
+
+            schema = ensure_archive(conn, year, archive_dir, present)
+            archive_file = os.path.relpath(archive_path(year, archive_dir), os.path.dirname(os.path.abspath(db_path)))
+            # One transaction per year spanning hot + archive (rollback journal keeps both atomic)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                summaries = [archive_job(conn, job, schema, present, refs) + (year, archive_file) for job in jobs]
+                for table, found in logs:
+                    for i in range(0, len(found), 500):
+                        chunk = [log_id for log_id, _ in found[i:i + 500]]
+                        move_rows(conn, table, schema, f'id IN ({", ".join("?" * len(chunk))})', chunk)
+                    per_job = {}
+                    for _, wo_id in found:
+                        per_job[wo_id] = per_job.get(wo_id, 0) + 1
+                    conn.executemany(
+                        f'UPDATE main.archive_summary SET {table[:-1]}_count = {table[:-1]}_count + ? '
+                        f'WHERE work_order_id = ?', [(n, wo_id) for wo_id, n in per_job.items()])
+                # Work orders an earlier run had to leave hot may be unreferenced by now
+                for (wo_id,) in conn.execute(
+                        '''SELECT work_order_id FROM main.archive_summary
+                           WHERE archive_year = ? AND work_order_id IN (SELECT id FROM main.work_orders)''',
+                        (year,)).fetchall():
+                    release_work_order(conn, wo_id, schema, refs)
+                conn.executemany(
+                    '''INSERT INTO main.archive_summary (work_order_id, work_order_number, client_id, title, status,
+                       closed_date, moisture_log_count, equipment_log_count, invoice_count, invoice_total,
+                       payment_total, archive_year, archive_file)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', summaries)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute(f'DETACH DATABASE {schema}')
+            compact = sqlite3.connect(archive_path(year, archive_dir))
+            compact.execute('VACUUM')
+            compact.close()
+
+        if by_year and not dry_run:
+            conn.execute('PRAGMA optimize')
+        return archived_jobs
+    finally:
+        conn.close()
+
+
+def open_with_archives(db_path=DB_PATH, archive_dir=ARCHIVE_DIR, years=None):
+    """Connection to the hot DB with archive years attached and <table>_all views.
+
+    Only attach the years you need - SQLite allows 10 attached databases by default.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.create_function('bcs_inflate', 1, inflate_value, deterministic=True)
+    years = sorted(years) if years else archive_years(archive_dir)
+    schemas = []
+    for year in years:
+        path = archive_path(year, archive_dir)
+        if os.path.exists(path):
+            schema = f'archive_{year}'
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+            schemas.append(schema)
+
+    for table in ARCHIVED_TABLES:
+        if not table_exists(conn, table):
+            continue
+        columns = table_columns(conn, table)
+        inflated = ', '.join(f'bcs_inflate({c}) AS {c}' for c in columns)
+        parts = [f'SELECT {", ".join(columns)} FROM main.{table}']
+        for schema in schemas:
+            if table_exists(conn, table, schema):
+                parts.append(f'SELECT {inflated} FROM {schema}.{table}')
+        conn.execute(f'CREATE TEMP VIEW IF NOT EXISTS {table}_all AS ' + ' UNION ALL '.join(parts))
+    return conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive closed jobs and historical logs by year')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--archive-dir', help='Default: archive/ next to the database')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('archive', help='Move closed jobs older than the cutoff into archives')
+    run.add_argument('--before', required=True, help='Cutoff date (YYYY-MM-DD)')
+    run.add_argument('--dry-run', action='store_true')
+
+    query = sub.add_parser('query', help='Run SQL with archives attached (<table>_all views)')
+    query.add_argument('sql')
+    query.add_argument('--years', nargs='+', type=int)
+
+    sub.add_parser('list', help='Show archived jobs per year')
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f'❌ Database not found: {args.db}', file=sys.stderr)
+        return 1
+    archive_dir = args.archive_dir or os.path.join(os.path.dirname(os.path.abspath(args.db)), 'archive')
+
+    if args.command == 'archive':
+        try:
+            jobs = archive(args.db, args.before, archive_dir, args.dry_run)
+        except RuntimeError as error:
+            print(f'❌ {error}', file=sys.stderr)
+            return 1
+        print(f'\n✅ {"Would archive" if args.dry_run else "Archived"} {jobs} closed jobs before {args.before}')
+    elif args.command == 'query':
+        conn = open_with_archives(args.db, archive_dir, args.years)
+        try:
+            cursor = conn.execute(args.sql)
+            print('\t'.join(d[0] for d in cursor.description or []))
+            for row in cursor:
+                print('\t'.join('' if v is None else str(v) for v in row))
+        finally:
+            conn.close()
+    elif args.command == 'list':
+        conn = sqlite3.connect(args.db)
+        try:
+            if not table_exists(conn, 'archive_summary'):
+                print('No archives yet')
+                return 0
+            for year, jobs, logs, total in conn.execute(
+                '''SELECT archive_year, COUNT(work_order_id), SUM(moisture_log_count + equipment_log_count),
+                   SUM(invoice_total) FROM archive_summary GROUP BY archive_year ORDER BY archive_year'''):
+                print(f'   {year}: {jobs} jobs, {logs or 0} logs, ${total or 0:,.2f} invoiced')
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
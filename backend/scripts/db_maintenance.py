@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+SQLite Maintenance with Measured Impact
+Measures bcs-database.db (page/freelist counts, per-table and per-index size
+and fill via dbstat, probe query latency), decides what is due - quick/full
+integrity check, ANALYZE, WAL checkpoint, REINDEX of bloated indexes,
+incremental or full VACUUM - within a time budget, runs it, and appends the
+before/after metrics and timings to <db>.maintenance-history.jsonl beside it.
+
+Safe to run often (e.g. hourly from cron / Task Scheduler); it only does work
+that is due according to the measurements and the history log.
+
+Usage:
+    python3 db_maintenance.py run --budget 30
+    python3 db_maintenance.py run --dry-run
+    python3 db_maintenance.py status
+    python3 db_maintenance.py history --limit 10
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bcs-database.db'))
+
+FREELIST_VACUUM_RATIO = 0.20      # vacuum when this share of pages is free
+INDEX_REINDEX_FILL = 0.50         # reindex indexes whose pages are less full than this
+INDEX_REINDEX_MIN_PAGES = 64      # ...and that are big enough to matter
+ANALYZE_MAX_AGE = timedelta(days=7)
+ANALYZE_ROW_CHANGE = 0.10         # re-analyze when a table changed by 10% of its rows...
+ANALYZE_MIN_ROW_CHANGE = 100      # ...and by at least this many rows
+INTEGRITY_CHECK_MAX_AGE = timedelta(days=7)
+WAL_CHECKPOINT_BYTES = 16 * 1024 * 1024
+DEFAULT_VACUUM_BYTES_PER_SEC = 40 * 1024 * 1024  # until history has a measured rate
+
+# Representative route queries timed before and after maintenance
+PROBE_QUERIES = [
+    ("SELECT * FROM price_list WHERE item_name LIKE '%dry%' ORDER BY category, item_name", 'price_list'),
+    ('SELECT DISTINCT category FROM price_list ORDER BY category', 'price_list'),
+    ('SELECT * FROM moisture_logs ORDER BY log_date DESC, id DESC', 'moisture_logs'),
+    ('SELECT * FROM estimates ORDER BY id DESC', 'estimates'),
+    ('SELECT COUNT(*) FROM work_orders', 'work_orders'),
+]
+
+
+def history_path(db_path):
+    # One log per database: tenant clones and archives share a directory
+    return f'{os.path.abspath(db_path)}.maintenance-history.jsonl'
+
+
+def read_history(db_path):
+    path = history_path(db_path)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+
+def append_history(db_path, entry):
+    with open(history_path(db_path), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def completed(entry_action):
+    return 'seconds' in entry_action and 'error' not in entry_action and 'skipped' not in entry_action
+
+
+def last_run_of(history, action):
+    """Timestamp of the most recent history entry that completed `action`.
+
+    Entries skipped for the time budget or that failed (e.g. SQLITE_BUSY) don't
+    count, so the action stays due until it actually runs.
+    """
+    for entry in reversed(history):
+        if any(a['action'] == action and completed(a) for a in entry.get('actions', [])):
+            return datetime.fromisoformat(entry['started_at'])
+    return None
+
+
+def last_analyzed_tables(history):
+    """Per-table {'rows', 'seq'} recorded by the most recent completed ANALYZE, or None"""
+    for entry in reversed(history):
+        for a in entry.get('actions', []):
+            if a['action'] == 'analyze' and completed(a):
+                return a.get('tables')
+    return None
+
+
+def table_changes(tables, baseline):
+    """[(table, rows changed, rows at last ANALYZE)] for tables that moved enough to re-analyze.
+
+    Changes are the net row delta or, for AUTOINCREMENT tables, the inserts since
+    then (sqlite_sequence) - so a delete and re-seed of the price list counts in full.
+    """
+    changed = []
+    for table, now in tables.items():
+        then = baseline.get(table, {'rows': 0, 'seq': 0})
+        delta = max(abs(now['rows'] - then['rows']), max((now['seq'] or 0) - (then['seq'] or 0), 0))
+        if delta >= ANALYZE_MIN_ROW_CHANGE and delta >= ANALYZE_ROW_CHANGE * then['rows']:
+            changed.append((table, delta, then['rows']))
+    return changed
+
+
+def file_bytes(db_path):
+    return sum(os.path.getsize(p) for p in (db_path, db_path + '-wal') if os.path.exists(p))
+
+
+def time_probes(conn, tables):
+    """Best-of-3 milliseconds per probe query whose table exists"""
+    results = {}
+    for sql, table in PROBE_QUERIES:
+        if table not in tables:
+            continue
+        best = None
+        for _ in range(3):
+            started = time.perf_counter()
+            conn.execute(sql).fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[sql] = round(best * 1000, 3)
+    return results
+
+
+def measure(conn, db_path):
+    pragma = lambda name: conn.execute(f'PRAGMA {name}').fetchone()[0]
+    metrics = {
+        'file_bytes': file_bytes(db_path),
+        'page_size': pragma('page_size'),
+        'page_count': pragma('page_count'),
+        'freelist_count': pragma('freelist_count'),
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}[pragma('auto_vacuum')],
+        'journal_mode': pragma('journal_mode'),
+        'wal_bytes': os.path.getsize(db_path + '-wal') if os.path.exists(db_path + '-wal') else 0,
+        'btrees': {},
+        'row_count': 0,
+    }
+    metrics['freelist_ratio'] = metrics['freelist_count'] / metrics['page_count'] if metrics['page_count'] else 0.0
+
+    objects = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'index')").fetchall())
+    try:
+        for name, pages, size, unused in conn.execute(
+                'SELECT name, COUNT(*), SUM(pgsize), SUM(unused) FROM dbstat GROUP BY name'):
+            metrics['btrees'][name] = {
+                'type': objects.get(name, 'table'),
+                'pages': pages,
+                'bytes': size,
+                'fill': round(1 - (unused or 0) / size, 3) if size else 1.0,
+            }
+    except sqlite3.OperationalError:
+        # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB - sizes unavailable
+        metrics['btrees'] = None
+
+    tables = [n for n, t in objects.items() if t == 'table' and not n.startswith('sqlite_')]
+    sequences = dict(conn.execute('SELECT name, seq FROM sqlite_sequence')) if 'sqlite_sequence' in objects else {}
+    metrics['tables'] = {}
+    for table in tables:
+        rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        metrics['tables'][table] = {'rows': rows, 'seq': sequences.get(table)}
+        metrics['row_count'] += rows
+    metrics['probe_ms'] = time_probes(conn, set(tables))
+    metrics['has_stats'] = 'sqlite_stat1' in objects
+    return metrics
+
+
+def plan(metrics, history, budget_s, now):
+    """Decide what is due: [(action, argument, reason)] in execution order"""
+    actions = [('quick_check', None, 'every run')]
+
+    last_integrity = last_run_of(history, 'integrity_check')
+    if last_integrity is None or now - last_integrity > INTEGRITY_CHECK_MAX_AGE:
+        actions = [('integrity_check', None, 'weekly full check')]
+
+    if metrics['journal_mode'] == 'wal' and metrics['wal_bytes'] >= WAL_CHECKPOINT_BYTES:
+        actions.append(('wal_checkpoint', None, f"WAL at {metrics['wal_bytes'] / 1048576:.1f} MB"))
+
+    # Full vacuum rebuilds every index, so reindex only matters when we are not vacuuming
+    vacuum = None
+    if metrics['freelist_ratio'] >= FREELIST_VACUUM_RATIO:
+        reason = f"{metrics['freelist_ratio']:.0%} of pages free"
+        rate = vacuum_rate(history)
+        estimate_s = metrics['file_bytes'] / rate
+        if metrics['auto_vacuum'] == 'incremental':
+            pages = metrics['freelist_count']
+            if estimate_s > budget_s:
+                pages = max(int(pages * budget_s / estimate_s), 1)
+            vacuum = ('incremental_vacuum', pages, reason)
+        elif estimate_s <= budget_s:
+            vacuum = ('vacuum', None, f'{reason}, ~{estimate_s:.1f}s estimated')
+        else:
+            actions.append(('skip_vacuum', None, f'{reason} but ~{estimate_s:.0f}s exceeds {budget_s:.0f}s budget'))
+    if vacuum:
+        actions.append(vacuum)
+
+    if metrics['btrees'] and not (vacuum and vacuum[0] == 'vacuum'):
+        for name, info in sorted(metrics['btrees'].items()):
+            if (info['type'] == 'index' and info['pages'] >= INDEX_REINDEX_MIN_PAGES
+                    and info['fill'] < INDEX_REINDEX_FILL and not name.startswith('sqlite_autoindex')):
+                actions.append(('reindex', name, f"{info['pages']} pages at {info['fill']:.0%} fill"))
+
+    last_analyze = last_run_of(history, 'analyze')
+    baseline = last_analyzed_tables(history)
+    if not metrics['has_stats']:
+        actions.append(('analyze', None, 'no sqlite_stat1'))
+    elif last_analyze is None or now - last_analyze > ANALYZE_MAX_AGE:
+        actions.append(('analyze', None, 'statistics older than 7 days'))
+    elif baseline is None:
+        actions.append(('analyze', None, 'no per-table row counts recorded at the last ANALYZE'))
+    else:
+        changed = table_changes(metrics['tables'], baseline)
+        if changed:
+            actions.append(('analyze', None, 'changed since last ANALYZE: ' + ', '.join(
+                f'{table} {delta:,} of {rows:,} rows' for table, delta, rows in changed[:5])))
+
+    actions.append(('optimize', None, 'every run'))
+    return actions
+
+
+def vacuum_rate(history):
+    """Bytes/second of the most recent measured full VACUUM"""
+    for entry in reversed(history):
+        for action in entry.get('actions', []):
+            if action['action'] == 'vacuum' and action.get('seconds'):
+                return max(entry['before']['file_bytes'] / action['seconds'], 1)
+    return DEFAULT_VACUUM_BYTES_PER_SEC
+
+
+def execute(conn, action, argument):
+    """Run one action; returns an optional result string"""
+    if action in ('quick_check', 'integrity_check'):
+        rows = [r[0] for r in conn.execute(f'PRAGMA {action}').fetchall()]
+        if rows != ['ok']:
+            raise RuntimeError(f'{action} failed: ' + '; '.join(rows[:10]))
+        return 'ok'
+    if action == 'wal_checkpoint':
+        busy, log, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        return f'busy={busy} log={log} checkpointed={checkpointed}'
+    if action == 'incremental_vacuum':
+        conn.execute(f'PRAGMA incremental_vacuum({int(argument)})').fetchall()
+        return f'{argument} pages'
+    if action == 'vacuum':
+        conn.execute('VACUUM')
+    elif action == 'reindex':
+        conn.execute(f'REINDEX "{argument}"')
+    elif action == 'analyze':
+        conn.execute('ANALYZE')
+    elif action == 'optimize':
+        conn.execute('PRAGMA optimize')
+    return None
+
+
+def run(db_path, budget_s=60.0, dry_run=False, busy_timeout_ms=5000):
+    history = read_history(db_path)
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000.0, isolation_level=None)
+    try:
+        now = datetime.now()
+        before = measure(conn, db_path)
+        actions = plan(before, history, budget_s, now)
+        if dry_run:
+            return {'before': before, 'planned': actions}
+
+        started = time.perf_counter()
+        done = []
+        for action, argument, reason in actions:
+            if action.startswith('skip_'):
+                done.append({'action': action, 'reason': reason})
+                continue
+            remaining = budget_s - (time.perf_counter() - started)
+            if remaining <= 0 and action not in ('quick_check', 'optimize'):
+                done.append({'action': action, 'reason': reason, 'skipped': 'time budget exhausted'})
+                continue
+            t0 = time.perf_counter()
+            try:
+                result = execute(conn, action, argument)
+                done.append({'action': action, 'argument': argument, 'reason': reason,
+                             'seconds': round(time.perf_counter() - t0, 3), 'result': result})
+                if action == 'analyze':
+                    # Baseline for deciding when the statistics are stale again
+                    done[-1]['tables'] = before['tables']
+            except sqlite3.OperationalError as error:
+                # Usually SQLITE_BUSY from a live server - try again next run
+                done.append({'action': action, 'argument': argument, 'reason': reason, 'error': str(error)})
+
+        after = measure(conn, db_path)
+        entry = {
+            'started_at': now.isoformat(timespec='seconds'),
+            'duration_s': round(time.perf_counter() - started, 3),
+            'actions': done,
+            'size_delta_bytes': after['file_bytes'] - before['file_bytes'],
+            'before': summarize(before),
+            'after': summarize(after),
+        }
+        append_history(db_path, entry)
+        return entry
+    finally:
+        conn.close()
+
+
+def summarize(metrics):
+    """History keeps totals and probe timings; per-btree detail only for the largest objects"""
+    summary = {k: v for k, v in metrics.items() if k not in ('btrees', 'tables')}
+    if metrics['btrees']:
+        largest = sorted(metrics['btrees'].items(), key=lambda kv: -kv[1]['bytes'])[:15]
+        summary['largest'] = {name: info for name, info in largest}
+    return summary
+
+
+def print_metrics(metrics):
+    print(f"   Size: {metrics['file_bytes'] / 1048576:.2f} MB   pages {metrics['page_count']:,} × {metrics['page_size']}   "
+          f"free {metrics['freelist_count']:,} ({metrics['freelist_ratio']:.1%})   "
+          f"journal {metrics['journal_mode']}   auto_vacuum {metrics['auto_vacuum']}")
+    if metrics.get('btrees'):
+        largest = sorted(metrics['btrees'].items(), key=lambda kv: -kv[1]['bytes'])[:10]
+        for name, info in largest:
+            print(f"   {info['type']:<6} {name:<40} {info['bytes'] / 1024:>10,.0f} KB  fill {info['fill']:.0%}")
+    for sql, ms in metrics['probe_ms'].items():
+        print(f'   {ms:>9.2f} ms  {sql[:70]}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measured SQLite maintenance for bcs-database.db')
+    parser.add_argument('--db', default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_cmd = sub.add_parser('run', help='Measure, run whatever maintenance is due, log the impact')
+    run_cmd.add_argument('--budget', type=float, default=60.0, help='Time budget in seconds')
+    run_cmd.add_argument('--dry-run', action='store_true', help='Only show the plan')
+
+    sub.add_parser('status', help='Show current measurements')
+
+    hist = sub.add_parser('history', help='Show recent maintenance runs')
+    hist.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f'❌ Database not found: {args.db}', file=sys.stderr)
+        return 1
+
+    if args.command == 'run':
+        try:
+            result = run(args.db, args.budget, args.dry_run)
+        except RuntimeError as error:
+            print(f'❌ {error}', file=sys.stderr)
+            return 2
+        if args.dry_run:
+            print('📊 Current state:')
+            print_metrics(result['before'])
+            print('\n🔧 Planned:')
+            for action, argument, reason in result['planned']:
+                print(f"   {action}{f' {argument}' if argument is not None else ''} - {reason}")
+            return 0
+        for action in result['actions']:
+            status = action.get('error') or action.get('skipped') or f"{action.get('seconds', 0):.2f}s"
+            print(f"   {action['action']:<20} {status:<12} {action['reason']}")
+        before, after = result['before'], result['after']
+        print(f"\n✅ {before['file_bytes'] / 1048576:.2f} MB → {after['file_bytes'] / 1048576:.2f} MB "
+              f"({result['size_delta_bytes'] / 1048576:+.2f} MB) in {result['duration_s']:.2f}s")
+        for sql, ms in after['probe_ms'].items():
+            print(f"   {before['probe_ms'].get(sql, 0):>8.2f} → {ms:>8.2f} ms  {sql[:60]}")
+    elif args.command == 'status':
+        conn = sqlite3.connect(f'file:{args.db}?mode=ro', uri=True)
+        try:
+            print_metrics(measure(conn, args.db))
+        finally:
+            conn.close()
+    elif args.command == 'history':
+        for entry in read_history(args.db)[-args.limit:]:
+            names = ', '.join(a['action'] for a in entry['actions'] if 'seconds' in a)
+            print(f"   {entry['started_at']}  {entry['duration_s']:>7.2f}s  "
+                  f"{entry['size_delta_bytes'] / 1048576:+8.2f} MB  {names}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Bulk Estimate Export for Carriers
+Streams estimates joined with their line items, client and price list details
+straight from a SQLite cursor into CSV or XLSX (openpyxl write-only mode), so
+memory stays flat no matter how many rows are exported. Large exports can be
+split into shards by estimate id and written in parallel processes.
+
+Usage:
+    python3 export_estimates.py -o estimates-2024.csv --from 2024-01-01 --to 2024-12-31
+    python3 export_estimates.py -o exports/ --format xlsx --status approved --shards 4
+    python3 export_estimates.py -o farmers.csv --client-id 12 --client-id 31
+
+XLSX output needs openpyxl (pip install openpyxl); CSV has no dependencies.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bcs-database.db'))
+
+FETCH_SIZE = 5000
+XLSX_MAX_ROWS = 1048576
+
+# Optional columns pulled in when the table in this database has them
+CLIENT_COLUMNS = ['name', 'company', 'insurance_company', 'claim_number', 'policy_number']
+ITEM_COLUMNS = ['category', 'code', 'item_name', 'description', 'quantity', 'unit', 'unit_price', 'total_price', 'notes']
+PRICE_COLUMNS = ['item_name', 'category', 'unit', 'unit_price', 'labor_hours', 'material_cost', 'equipment_cost']
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def line_items_table(conn):
+    """routes/estimates.mjs reads line_items; older databases only have estimate_line_items"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in ('line_items', 'estimate_line_items'):
+        if table in tables:
+            return table
+    raise RuntimeError('No line items table found (line_items or estimate_line_items)')
+
+
+def prepare_price_lookup(conn):
+    """Resolve each price list code to one row id, once per connection.
+
+    xactimate_code is neither UNIQUE nor indexed in every schema, so joining on it
+    directly would duplicate line items or scan price_list for each of them.
+    """
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS price_code_ids (code TEXT PRIMARY KEY, id INTEGER) WITHOUT ROWID')
+    conn.execute('DELETE FROM temp.price_code_ids')
+    conn.execute('''
+        INSERT INTO temp.price_code_ids (code, id)
+        SELECT xactimate_code, MIN(id) FROM price_list
+        WHERE xactimate_code IS NOT NULL GROUP BY xactimate_code''')
+
+
+def build_query(conn, filters):
+    """Return (select_sql, headers, where_sql, params) for the export join"""
+    items_table = line_items_table(conn)
+    item_cols = [c for c in ITEM_COLUMNS if c in table_columns(conn, items_table)]
+    client_cols = [c for c in CLIENT_COLUMNS if c in table_columns(conn, 'clients')]
+    price_cols = [c for c in PRICE_COLUMNS if c in table_columns(conn, 'price_list')] if 'code' in item_cols else []
+    estimate_cols = [c for c in ('estimate_number', 'title', 'status', 'created_at', 'subtotal', 'tax_amount', 'total_amount')
+                     if c in table_columns(conn, 'estimates')]
+
+    select = ['e.id'] + [f'e.{c}' for c in estimate_cols] + [f'c.{c}' for c in client_cols] \
+        + [f'li.{c}' for c in item_cols] + [f'pl.{c}' for c in price_cols]
+    headers = ['estimate_id'] + [f'estimate_{c}' if not c.startswith('estimate') else c for c in estimate_cols] \
+        + [f'client_{c}' for c in client_cols] + [f'item_{c}' for c in item_cols] + [f'price_list_{c}' for c in price_cols]
+
+    sql = f'''
+        SELECT {", ".join(select)}
+        FROM estimates e
+        JOIN {items_table} li ON li.estimate_id = e.id
+        LEFT JOIN clients c ON c.id = e.client_id'''
+    if price_cols:
+        prepare_price_lookup(conn)
+        sql += '''
+        LEFT JOIN temp.price_code_ids pc ON pc.code = li.code
+        LEFT JOIN price_list pl ON pl.id = pc.id'''
+
+    where, params = estimate_filters(filters)
+    return sql, headers, where, params, items_table
+
+
+def estimate_filters(filters):
+    where, params = ['1=1'], []
+    if filters.get('date_from'):
+        where.append('date(e.created_at) >= date(?)')
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        where.append('date(e.created_at) <= date(?)')
+        params.append(filters['date_to'])
+    if filters.get('client_ids'):
+        where.append(f'e.client_id IN ({", ".join("?" * len(filters["client_ids"]))})')
+        params.extend(filters['client_ids'])
+    if filters.get('statuses'):
+        where.append(f'e.status IN ({", ".join("?" * len(filters["statuses"]))})')
+        params.extend(filters['statuses'])
+    return ' AND '.join(where), params
+
+
+def plan_shards(conn, filters, shards):
+    """Split matching estimates into id ranges holding roughly equal line item counts"""
+    items_table = line_items_table(conn)
+    where, params = estimate_filters(filters)
+    # One grouped pass over the items; a per-estimate COUNT scans them once per
+    # estimate when estimate_id isn't indexed
+    per_estimate = dict(conn.execute(f'SELECT estimate_id, COUNT(*) FROM {items_table} GROUP BY estimate_id'))
+    counts = [(estimate_id, per_estimate.get(estimate_id, 0)) for (estimate_id,) in conn.execute(
+        f'SELECT e.id FROM estimates e WHERE {where} ORDER BY e.id', params)]
+    total = sum(n for _, n in counts)
+    if not counts or total == 0:
+        return [], 0
+    target = total / shards
+    ranges, start, running = [], counts[0][0], 0
+    for estimate_id, n in counts:
+        running += n
+        if running >= target * (len(ranges) + 1) and len(ranges) < shards - 1:
+            ranges.append((start, estimate_id))
+            start = estimate_id + 1
+    ranges.append((start, counts[-1][0]))
+    return [r for r in ranges if r[0] <= r[1]], total
+
+
+class CsvSink:
+    def __init__(self, path, headers):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxSink:
+    def __init__(self, path, headers):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError('XLSX export needs openpyxl: pip install openpyxl')
+        self.path = path
+        self.headers = headers
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheets += 1
+        self.sheet = self.workbook.create_sheet(f'Line Items {self.sheets}' if self.sheets > 1 else 'Line Items')
+        self.sheet.append(self.headers)
+        self.rows = 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.rows >= XLSX_MAX_ROWS:
+                self._new_sheet()
+            self.sheet.append(row)
+            self.rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+SINKS = {'csv': CsvSink, 'xlsx': XlsxSink}
+
+
+def export_range(db_path, filters, id_range, path, fmt):
+    """Stream one shard to disk; runs in a worker process. Returns rows written."""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        sql, headers, where, params, items_table = build_query(conn, filters)
+        order = 'e.id, li.sort_order, li.id' if 'sort_order' in table_columns(conn, items_table) else 'e.id, li.id'
+        if id_range:
+            where += ' AND e.id BETWEEN ? AND ?'
+            params = params + list(id_range)
+        cursor = conn.execute(f'{sql}\n        WHERE {where}\n        ORDER BY {order}', params)
+        sink = SINKS[fmt](path, headers)
+        written = 0
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                sink.write_rows(rows)
+                written += len(rows)
+        finally:
+            sink.close()
+        return written
+    finally:
+        conn.close()
+
+
+def export(db_path, output, fmt='csv', filters=None, shards=1):
+    """Export to `output` (a file, or a directory when shards > 1); returns [(path, rows)]"""
+    filters = filters or {}
+    if shards <= 1:
+        return [(output, export_range(db_path, filters, None, output, fmt))]
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        ranges, _ = plan_shards(conn, filters, shards)
+    finally:
+        conn.close()
+    os.makedirs(output, exist_ok=True)
+    paths = [os.path.join(output, f'estimates-{i + 1:03d}.{fmt}') for i in range(len(ranges))]
+    with ProcessPoolExecutor(max_workers=len(ranges) or 1) as pool:
+        futures = [pool.submit(export_range, db_path, filters, r, p, fmt) for r, p in zip(ranges, paths)]
+        return [(p, f.result()) for p, f in zip(paths, futures)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream estimates and line items to CSV/XLSX')
+    parser.add_argument('-o', '--output', required=True, help='Output file, or directory when --shards > 1')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--format', choices=sorted(SINKS), help='Default: from the output extension, else csv')
+    parser.add_argument('--from', dest='date_from', help='Estimates created on/after (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', help='Estimates created on/before (YYYY-MM-DD)')
+    parser.add_argument('--client-id', dest='client_ids', type=int, action='append')
+    parser.add_argument('--status', dest='statuses', action='append')
+    parser.add_argument('--shards', type=int, default=1, help='Parallel output files')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f'❌ Database not found: {args.db}', file=sys.stderr)
+        return 1
+    fmt = args.format or ('xlsx' if args.output.lower().endswith('.xlsx') else 'csv')
+    filters = {k: getattr(args, k) for k in ('date_from', 'date_to', 'client_ids', 'statuses')}
+
+    started = time.perf_counter()
+    try:
+        results = export(args.db, args.output, fmt, filters, args.shards)
+    except RuntimeError as error:
+        print(f'❌ {error}', file=sys.stderr)
+        return 1
+    for path, rows in results:
+        print(f'   {path}: {rows:,} rows')
+    print(f'✅ Exported {sum(r for _, r in results):,} line items in {time.perf_counter() - started:.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
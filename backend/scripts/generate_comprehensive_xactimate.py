@@ -421,7 +421,7 @@ import {{ fileURLToPath }} from 'url';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
-const DB_PATH = path.join(__dirname, '../database/bcs-database.db');
+const DB_PATH = process.env.DB_PATH || path.join(__dirname, '../database/bcs-database.db');
 
 const db = new sqlite3.Database(DB_PATH);
 
@@ -8,7 +8,7 @@ import fs from 'fs';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
-const DB_PATH = path.join(__dirname, '../database/bcs-database.db');
+const DB_PATH = process.env.DB_PATH || path.join(__dirname, '../database/bcs-database.db');
 
 const dbDir = path.dirname(DB_PATH);
 if (!fs.existsSync(dbDir)) {
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Concurrent Query Replay Load Tester
+Replays the query shapes used by the dashboard, price list, estimates and
+moisture log routes against a scratch copy of bcs-database.db from many
+concurrent clients sharing a connection pool, in WAL and rollback-journal
+modes, and reports throughput, p50/p99 latency and SQLITE_BUSY rates.
+
+Usage:
+    python3 load_test.py --clients 16 --pool-size 8 --duration 20
+    python3 load_test.py --modes wal --write-ratio 0.2 --json results.json
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bcs-database.db'))
+
+JOURNAL_MODES = {'wal': 'WAL', 'rollback': 'DELETE'}
+
+
+# ============================================
+# WORKLOADS - query shapes copied from routes/
+# ============================================
+# Each workload is one route request: a list of (sql, params_fn) executed in
+# order on one connection, in autocommit mode like node-sqlite3.
+
+def dashboard_stats(p):
+    return [
+        ('SELECT COUNT(*) as count FROM clients', ()),
+        ('SELECT COUNT(*) as count FROM work_orders', ()),
+        ('SELECT COUNT(*) as count FROM invoices', ()),
+        ('SELECT COUNT(*) as count FROM employees', ()),
+        ('SELECT COUNT(*) as count FROM equipment', ()),
+        (f"SELECT SUM({p.invoice_amount}) as total, COUNT(*) as count FROM invoices WHERE status = 'paid'", ()),
+        (f"SELECT SUM({p.invoice_amount}) as total, COUNT(*) as count FROM invoices WHERE status = 'pending'", ()),
+        ('''SELECT wo.*, c.name as client_name
+            FROM work_orders wo
+            LEFT JOIN clients c ON wo.client_id = c.id
+            ORDER BY wo.created_at DESC
+            LIMIT 5''', ()),
+        ("SELECT COUNT(*) as count FROM work_orders WHERE status = 'completed'", ()),
+    ]
+
+
+def price_list_search(p):
+    term = f'%{p.search_term()}%'
+    sql = 'SELECT * FROM price_list WHERE 1=1 AND (item_name LIKE ? OR xactimate_code LIKE ? OR description LIKE ?)'
+    params = [term, term, term]
+    if p.categories and random.random() < 0.4:
+        sql += ' AND category = ?'
+        params.append(random.choice(p.categories))
+    return [(sql + ' ORDER BY category, item_name', params)]
+
+
+def price_list_categories(p):
+    return [('SELECT DISTINCT category FROM price_list ORDER BY category', ())]
+
+
+def estimates_list(p):
+    return [('SELECT * FROM estimates ORDER BY id DESC', ())]
+
+
+def estimate_detail(p):
+    estimate_id = p.pick('estimates')
+    return [
+        ('SELECT * FROM estimates WHERE id = ?', (estimate_id,)),
+        ('SELECT * FROM line_items WHERE estimate_id = ? ORDER BY sort_order, id', (estimate_id,)),
+    ]
+
+
+def moisture_logs_all(p):
+    return [('SELECT * FROM moisture_logs ORDER BY log_date DESC, id DESC', ())]
+
+
+def moisture_logs_by_job(p):
+    return [('SELECT * FROM moisture_logs WHERE job_id = ? ORDER BY log_date DESC', (p.pick('moisture_jobs'),))]
+
+
+def moisture_log_create(p):
+    return [(
+        '''INSERT INTO moisture_logs (job_id, work_order_id, log_date, location, material_type,
+           moisture_reading, target_reading, temperature, humidity, technician, notes)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        (p.pick('moisture_jobs'), None, time.strftime('%Y-%m-%d'), random.choice(['Kitchen', 'Hall', 'Bath', 'Bedroom']),
+         random.choice(['Drywall', 'Wood', 'Concrete']), round(random.uniform(8, 40), 1), 15, 72, 45, 'loadtest', 'loadtest'),
+    )]
+
+
+def line_item_add(p):
+    estimate_id = p.pick('estimates')
+    qty = round(random.uniform(1, 400), 2)
+    price = round(random.uniform(1, 200), 2)
+    return [
+        ('''INSERT INTO line_items (estimate_id, category, code, description, quantity, unit, unit_price, total_price, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+         (estimate_id, 'custom', 'LOAD-TEST', 'loadtest', qty, 'EA', price, qty * price, 'loadtest')),
+        ('SELECT SUM(total_price) as subtotal FROM line_items WHERE estimate_id = ?', (estimate_id,)),
+        ('''UPDATE estimates
+            SET subtotal = (SELECT SUM(total_price) FROM line_items WHERE estimate_id = ?), updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?''', (estimate_id, estimate_id)),
+    ]
+
+
+# name -> (builder, relative weight, is_write)
+WORKLOADS = {
+    'dashboard_stats': (dashboard_stats, 10, False),
+    'price_list_search': (price_list_search, 30, False),
+    'price_list_categories': (price_list_categories, 5, False),
+    'estimates_list': (estimates_list, 10, False),
+    'estimate_detail': (estimate_detail, 20, False),
+    'moisture_logs_all': (moisture_logs_all, 5, False),
+    'moisture_logs_by_job': (moisture_logs_by_job, 10, False),
+    'moisture_log_create': (moisture_log_create, 6, True),
+    'line_item_add': (line_item_add, 4, True),
+}
+
+
+class ParamSampler:
+    """Realistic parameter distributions sampled from the data actually in the DB"""
+
+    def __init__(self, conn):
+        self.pools = {
+            'estimates': self._ids(conn, 'SELECT id FROM estimates ORDER BY id'),
+            'moisture_jobs': self._ids(conn, 'SELECT DISTINCT job_id FROM moisture_logs ORDER BY job_id'),
+        }
+        self.categories = [r[0] for r in self._rows(conn, 'SELECT DISTINCT category FROM price_list') if r[0]]
+        words = set()
+        for (name,) in self._rows(conn, 'SELECT item_name FROM price_list LIMIT 5000'):
+            words.update(w.lower() for w in (name or '').replace('-', ' ').split() if len(w) > 3)
+        self.search_terms = sorted(words) or ['water', 'drywall', 'paint']
+        # initDatabase.js calls it amount, createAllTables.mjs total_amount
+        invoice_columns = [r[1] for r in self._rows(conn, 'PRAGMA table_info(invoices)')]
+        self.invoice_amount = 'total_amount' if 'total_amount' in invoice_columns else 'amount'
+
+    @staticmethod
+    def _rows(conn, sql):
+        try:
+            return conn.execute(sql).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _ids(self, conn, sql):
+        return [r[0] for r in self._rows(conn, sql)] or [1]
+
+    def pick(self, pool):
+        """Skewed toward the newest rows - users mostly open recent jobs"""
+        ids = self.pools[pool]
+        idx = min(int(random.expovariate(1.0 / max(len(ids) / 10, 1))), len(ids) - 1)
+        return ids[-1 - idx]
+
+    def search_term(self):
+        # Users type partial words
+        word = random.choice(self.search_terms)
+        return word[:random.randint(3, len(word))]
+
+
+def is_busy(error):
+    name = getattr(error, 'sqlite_errorname', '')
+    return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED')) or 'locked' in str(error) or 'busy' in str(error)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def prepare_scratch_db(source, mode, scratch_dir):
+    """Copy the source DB so the test never writes to the real file"""
+    path = os.path.join(scratch_dir, f'loadtest-{mode}.db')
+    src = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+    dst = sqlite3.connect(path)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+    dst.execute(f'PRAGMA journal_mode={JOURNAL_MODES[mode]}')
+    dst.close()
+    return path
+
+
+def open_pool(path, size, busy_timeout_ms):
+    pool = queue.Queue()
+    for _ in range(size):
+        conn = sqlite3.connect(path, timeout=busy_timeout_ms / 1000.0,
+                               isolation_level=None, check_same_thread=False)
+        pool.put(conn)
+    return pool
+
+
+def run_request(conn, statements):
+    for sql, params in statements:
+        conn.execute(sql, params).fetchall()
+
+
+def preflight(path, sampler, workloads):
+    """Drop workloads whose tables/columns don't exist in this schema"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    usable, skipped = {}, {}
+    try:
+        for name, (builder, weight, is_write) in workloads.items():
+            try:
+                conn.execute('BEGIN')
+                run_request(conn, builder(sampler))
+                usable[name] = (builder, weight, is_write)
+            except sqlite3.Error as error:
+                skipped[name] = str(error)
+            finally:
+                conn.execute('ROLLBACK')
+    finally:
+        conn.close()
+    return usable, skipped
+
+
+def run_mode(source, mode, clients, pool_size, duration, busy_timeout_ms, write_ratio, scratch_dir):
+    path = prepare_scratch_db(source, mode, scratch_dir)
+    conn = sqlite3.connect(path)
+    try:
+        sampler = ParamSampler(conn)
+    finally:
+        conn.close()
+    workloads, skipped = preflight(path, sampler, WORKLOADS)
+    if not workloads:
+        reasons = '\n   '.join(f'{name}: {reason}' for name, reason in skipped.items())
+        raise RuntimeError(f'No workload can run against this schema:\n   {reasons}')
+
+    reads = [(n, w) for n, (_, w, is_write) in workloads.items() if not is_write]
+    writes = [(n, w) for n, (_, w, is_write) in workloads.items() if is_write]
+
+    def choose():
+        group = writes if writes and (not reads or random.random() < write_ratio) else reads
+        names, weights = zip(*group)
+        return random.choices(names, weights)[0]
+
+    pool = open_pool(path, pool_size, busy_timeout_ms)
+    latencies = defaultdict(list)
+    busy = defaultdict(int)
+    errors = defaultdict(int)
+    pool_wait = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        local_lat, local_busy, local_err, local_wait = defaultdict(list), defaultdict(int), defaultdict(int), []
+        while time.perf_counter() < deadline:
+            name = choose()
+            statements = workloads[name][0](sampler)
+            waited = time.perf_counter()
+            conn = pool.get()
+            started = time.perf_counter()
+            local_wait.append(started - waited)
+            try:
+                run_request(conn, statements)
+                local_lat[name].append(time.perf_counter() - started)
+            except sqlite3.OperationalError as error:
+                if is_busy(error):
+                    local_busy[name] += 1
+                else:
+                    local_err[name] += 1
+            except sqlite3.Error:
+                local_err[name] += 1
+            finally:
+                pool.put(conn)
+        with lock:
+            for name, values in local_lat.items():
+                latencies[name].extend(values)
+            for name, count in local_busy.items():
+                busy[name] += count
+            for name, count in local_err.items():
+                errors[name] += count
+            pool_wait.extend(local_wait)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - wall_start
+
+    while not pool.empty():
+        pool.get().close()
+
+    per_workload = {}
+    all_latencies = []
+    for name in workloads:
+        values = sorted(latencies.get(name, []))
+        all_latencies.extend(values)
+        attempts = len(values) + busy[name] + errors[name]
+        per_workload[name] = {
+            'ok': len(values),
+            'busy': busy[name],
+            'errors': errors[name],
+            'busy_rate': busy[name] / attempts if attempts else 0.0,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+    all_latencies.sort()
+    pool_wait.sort()
+    total_ok = len(all_latencies)
+    total_busy = sum(busy.values())
+    total_attempts = total_ok + total_busy + sum(errors.values())
+    return {
+        'mode': mode,
+        'journal_mode': JOURNAL_MODES[mode],
+        'clients': clients,
+        'pool_size': pool_size,
+        'elapsed_s': elapsed,
+        'throughput_rps': total_ok / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(all_latencies, 50) * 1000,
+        'p99_ms': percentile(all_latencies, 99) * 1000,
+        'pool_wait_p99_ms': percentile(pool_wait, 99) * 1000,
+        'busy_rate': total_busy / total_attempts if total_attempts else 0.0,
+        'workloads': per_workload,
+        'skipped': skipped,
+    }
+
+
+def print_report(result):
+    print(f"\n📊 {result['journal_mode']} - {result['clients']} clients / {result['pool_size']} connections "
+          f"/ {result['elapsed_s']:.1f}s")
+    print(f"   Throughput: {result['throughput_rps']:,.0f} req/s   p50 {result['p50_ms']:.2f} ms   "
+          f"p99 {result['p99_ms']:.2f} ms   pool wait p99 {result['pool_wait_p99_ms']:.2f} ms   "
+          f"BUSY {result['busy_rate']:.2%}")
+    print(f"   {'workload':<24}{'ok':>8}{'busy':>7}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, stats in result['workloads'].items():
+        print(f"   {name:<24}{stats['ok']:>8}{stats['busy']:>7}{stats['errors']:>6}"
+              f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    for name, reason in result['skipped'].items():
+        print(f'   ⚠️  skipped {name}: {reason}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent query replay load test for the BCS SQLite database')
+    parser.add_argument('--db', default=DB_PATH, help='Source database (copied, never modified)')
+    parser.add_argument('--modes', nargs='+', choices=sorted(JOURNAL_MODES), default=['wal', 'rollback'])
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent simulated users')
+    parser.add_argument('--pool-size', type=int, default=8, help='Shared SQLite connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode')
+    parser.add_argument('--busy-timeout', type=int, default=1000, help='busy_timeout in ms')
+    parser.add_argument('--write-ratio', type=float, default=0.1, help='Fraction of requests that write')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f'❌ Database not found: {args.db}', file=sys.stderr)
+        return 1
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    results = []
+    scratch_dir = tempfile.mkdtemp(prefix='bcs-loadtest-')
+    try:
+        for mode in args.modes:
+            try:
+                result = run_mode(args.db, mode, args.clients, args.pool_size, args.duration,
+                                  args.busy_timeout, args.write_ratio, scratch_dir)
+            except RuntimeError as error:
+                print(f'❌ {error}', file=sys.stderr)
+                return 1
+            print_report(result)
+            results.append(result)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\n📍 Results written to {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
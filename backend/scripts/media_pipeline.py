@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Job Photo Thumbnail & Derivative Cache
+Scans the uploads directory with a process pool and writes sized thumbnails
+and web/PDF-optimized derivatives of every job-site photo into a cache keyed
+by content hash (media-cache/<hash[:2]>/<hash>/<variant>.jpg). EXIF is
+stripped from derivatives after applying its orientation, so GPS and camera
+data never leave the office.
+
+Runs are incremental: files whose size and mtime match the manifest are
+skipped without being read, and identical photos uploaded twice share one set
+of derivatives. Gallery views and PDF generation can look derivatives up in
+media-cache/manifest.json instead of decoding multi-megabyte originals.
+
+Usage:
+    python3 media_pipeline.py build
+    python3 media_pipeline.py build --workers 8 --prune
+    python3 media_pipeline.py lookup uploads/media/files-1700000000000-123.jpg --variant pdf
+
+Needs Pillow (pip install Pillow).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOADS_DIR = os.environ.get('BCS_UPLOADS_DIR', os.path.join(BACKEND_DIR, 'uploads'))
+CACHE_DIR = os.environ.get('BCS_MEDIA_CACHE_DIR', os.path.join(BACKEND_DIR, 'media-cache'))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+
+# variant -> (longest side in px, JPEG quality). Generated largest first from one decode.
+VARIANTS = {
+    'pdf': (1600, 85),
+    'web': (1280, 80),
+    'medium': (640, 78),
+    'thumb': (240, 75),
+}
+
+# Bump when variant sizes/encoding change so every derivative is regenerated
+PIPELINE_VERSION = 1
+
+
+def manifest_path(cache_dir):
+    return os.path.join(cache_dir, 'manifest.json')
+
+
+def load_manifest(cache_dir):
+    path = manifest_path(cache_dir)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == PIPELINE_VERSION:
+            return manifest
+    return {'version': PIPELINE_VERSION, 'files': {}}
+
+
+def save_manifest(cache_dir, manifest):
+    path = manifest_path(cache_dir)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def derivative_dir(cache_dir, digest):
+    return os.path.join(cache_dir, digest[:2], digest)
+
+
+def scan_uploads(uploads_dir, cache_dir):
+    """Yield (relative path, absolute path, stat) for every image under uploads"""
+    cache_abs = os.path.abspath(cache_dir)
+    for root, dirs, files in os.walk(uploads_dir):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != cache_abs and not d.startswith('.')]
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, BACKEND_DIR), path, os.stat(path)
+
+
+def render_derivatives(source, digest, cache_dir):
+    """Worker: decode once, write every variant. Returns {variant: [relpath, width, height, bytes]}"""
+    from PIL import Image, ImageOps
+
+    out_dir = derivative_dir(cache_dir, digest)
+    os.makedirs(out_dir, exist_ok=True)
+    largest = max(size for size, _ in VARIANTS.values())
+    results = {}
+
+    with Image.open(source) as original:
+        # JPEG can decode directly at 1/2, 1/4 or 1/8 scale - far cheaper than a full decode
+        original.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image.load()
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # Largest first, each subsequent variant downscaled from the previous one
+        for variant, (size, quality) in sorted(VARIANTS.items(), key=lambda kv: -kv[1][0]):
+            image.thumbnail((size, size), Image.LANCZOS)
+            ext = 'png' if has_alpha else 'jpg'
+            target = os.path.join(out_dir, f'{variant}.{ext}')
+            tmp = f'{target}.tmp-{os.getpid()}'
+            if has_alpha:
+                # PDFKit embeds only JPEG/PNG; PNG keeps transparency
+                image.save(tmp, 'PNG', optimize=True)
+            else:
+                # No exif= argument: derivatives carry no metadata
+                image.save(tmp, 'JPEG', quality=quality, optimize=True, progressive=True)
+            os.replace(tmp, target)
+            results[variant] = [os.path.relpath(target, cache_dir), image.width, image.height, os.path.getsize(target)]
+    return results
+
+
+# Digests already cached when the run started, set once per worker process
+_known_digests = frozenset()
+
+
+def _init_worker(known_digests):
+    global _known_digests
+    _known_digests = known_digests
+
+
+def process_file(rel, path, size, mtime_ns, cache_dir):
+    """Worker entry point: hash, then render unless this content is already cached.
+
+    Returns (rel, digest, size, mtime_ns, variants, error); variants is None when cached.
+    """
+    digest = None
+    try:
+        # Inside the try: an upload deleted or unreadable since the scan is just a failed file
+        digest = file_hash(path)
+        if digest in _known_digests and os.path.isdir(derivative_dir(cache_dir, digest)):
+            return rel, digest, size, mtime_ns, None, None
+        return rel, digest, size, mtime_ns, render_derivatives(path, digest, cache_dir), None
+    except Exception as error:  # unreadable, corrupt or unsupported image - record and move on
+        return rel, digest, size, mtime_ns, None, str(error)
+
+
+def build(uploads_dir=UPLOADS_DIR, cache_dir=CACHE_DIR, workers=None, prune=False):
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    files = manifest['files']
+    stats = {'scanned': 0, 'unchanged': 0, 'rendered': 0, 'deduplicated': 0, 'failed': 0, 'removed': 0}
+
+    seen = set()
+    pending = []
+    for rel, path, st in scan_uploads(uploads_dir, cache_dir):
+        stats['scanned'] += 1
+        seen.add(rel)
+        entry = files.get(rel)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns \
+                and (entry.get('variants') or entry.get('error')):
+            stats['unchanged'] += 1
+            continue
+        pending.append((rel, path, st.st_size, st.st_mtime_ns))
+
+    # Sources deleted since the last run drop out of the manifest
+    for rel in [r for r in files if r not in seen]:
+        del files[rel]
+        stats['removed'] += 1
+
+    known_hashes = {e['sha256']: e['variants'] for e in files.values() if e.get('variants')}
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(frozenset(known_hashes),)) as pool:
+            futures = [pool.submit(process_file, rel, path, size, mtime_ns, cache_dir)
+                       for rel, path, size, mtime_ns in pending]
+            for future in futures:
+                rel, digest, size, mtime_ns, variants, error = future.result()
+                if error:
+                    stats['failed'] += 1
+                    files[rel] = {'sha256': digest, 'size': size, 'mtime_ns': mtime_ns, 'error': error}
+                    print(f'   ⚠️  {rel}: {error}', file=sys.stderr)
+                    continue
+                if variants is None or digest in known_hashes:
+                    stats['deduplicated'] += 1
+                    variants = known_hashes[digest] if variants is None else variants
+                else:
+                    stats['rendered'] += 1
+                    known_hashes[digest] = variants
+                files[rel] = {'sha256': digest, 'size': size, 'mtime_ns': mtime_ns, 'variants': variants}
+                # Checkpoint so an interrupted run resumes where it left off
+                if (stats['rendered'] + stats['deduplicated']) % 200 == 0:
+                    save_manifest(cache_dir, manifest)
+
+    if prune:
+        live = {e['sha256'] for e in files.values()}
+        for prefix in os.listdir(cache_dir):
+            prefix_dir = os.path.join(cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for digest in os.listdir(prefix_dir):
+                if digest not in live:
+                    shutil.rmtree(os.path.join(prefix_dir, digest), ignore_errors=True)
+
+    save_manifest(cache_dir, manifest)
+    return stats
+
+
+def lookup(upload_path, variant, cache_dir=CACHE_DIR):
+    """Absolute path of a derivative for an upload, or None if not cached yet"""
+    rel = os.path.relpath(os.path.abspath(os.path.join(BACKEND_DIR, upload_path))
+                          if not os.path.isabs(upload_path) else upload_path, BACKEND_DIR)
+    entry = load_manifest(cache_dir)['files'].get(rel)
+    if not entry or variant not in entry.get('variants', {}):
+        return None
+    path = os.path.join(cache_dir, entry['variants'][variant][0])
+    return path if os.path.exists(path) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build thumbnails and optimized derivatives for uploaded photos')
+    parser.add_argument('--uploads-dir', default=UPLOADS_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_cmd = sub.add_parser('build', help='Incrementally generate derivatives')
+    build_cmd.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    build_cmd.add_argument('--prune', action='store_true', help='Delete derivatives no upload references')
+
+    lookup_cmd = sub.add_parser('lookup', help='Print the cached derivative path for an upload')
+    lookup_cmd.add_argument('path', help='Upload path relative to backend/, e.g. uploads/media/x.jpg')
+    lookup_cmd.add_argument('--variant', choices=sorted(VARIANTS), default='web')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            print('❌ Pillow is required: pip install Pillow', file=sys.stderr)
+            return 1
+        if not os.path.isdir(args.uploads_dir):
+            print(f'❌ Uploads directory not found: {args.uploads_dir}', file=sys.stderr)
+            return 1
+        started = time.perf_counter()
+        stats = build(args.uploads_dir, args.cache_dir, args.workers, args.prune)
+        print(f"✅ {stats['scanned']} photos: {stats['rendered']} rendered, {stats['deduplicated']} duplicates, "
+              f"{stats['unchanged']} unchanged, {stats['failed']} failed, {stats['removed']} removed "
+              f"in {time.perf_counter() - started:.2f}s")
+        print(f'📍 Cache: {args.cache_dir}')
+    elif args.command == 'lookup':
+        path = lookup(args.path, args.variant, args.cache_dir)
+        if path is None:
+            print(f'❌ No {args.variant} derivative cached for {args.path}', file=sys.stderr)
+            return 1
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
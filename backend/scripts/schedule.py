@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Crew and Equipment Scheduling Analysis
+Builds per-resource interval indexes over calendar events, work orders and
+equipment deployments to find double-bookings, free windows and who/what is
+available in a time range.
+
+Each resource keeps its bookings as sorted, disjoint "busy blocks" (the union
+of overlapping bookings, with the booking ids inside each block), so an
+availability check is a single bisect - O(log n) per resource - and adding a
+booking only merges the blocks it touches.
+
+Usage:
+    python3 schedule.py conflicts --from 2025-10-01 --to 2025-10-31
+    python3 schedule.py available --start "2025-10-02 09:00" --end "2025-10-02 12:00" --type employee
+    python3 schedule.py free --resource equipment:4 --start 2025-10-01 --end 2025-10-15
+"""
+
+import argparse
+import heapq
+import os
+import sqlite3
+import sys
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bcs-database.db'))
+
+WORKDAY_START = 8
+WORKDAY_END = 17
+# Equipment not yet retrieved is treated as busy until this far out
+OPEN_DEPLOYMENT_DAYS = 365
+INACTIVE_STATUSES = ('cancelled', 'canceled')
+
+
+def parse_datetime(value, default_time='00:00'):
+    """Accept 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM[:SS]' or ISO 'T' forms"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip().replace('T', ' ').rstrip('Z')
+    if len(text) == 10:
+        text = f'{text} {default_time}'
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S.%f'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class Booking:
+    __slots__ = ('id', 'resource', 'start', 'end', 'source', 'label')
+
+    def __init__(self, booking_id, resource, start, end, source, label=''):
+        self.id = booking_id
+        self.resource = resource
+        self.start = start
+        self.end = end
+        self.source = source
+        self.label = label
+
+    def overlaps(self, start, end):
+        return self.start < end and start < self.end
+
+
+class ResourceIndex:
+    """Sorted disjoint busy blocks for one employee or piece of equipment"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.members = []
+
+    def add(self, booking):
+        """Merge a booking in; returns the existing bookings it overlaps"""
+        lo = bisect_right(self.ends, booking.start)
+        hi = bisect_left(self.starts, booking.end)
+        # Blocks lo..hi-1 overlap [start, end); blocks are disjoint so that is a contiguous run
+        merged = [booking]
+        start, end = booking.start, booking.end
+        conflicts = []
+        for i in range(lo, hi):
+            for other in self.members[i]:
+                if other.overlaps(booking.start, booking.end):
+                    conflicts.append(other)
+            merged.extend(self.members[i])
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[i])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+        self.members[lo:hi] = [merged]
+        return conflicts
+
+    def remove(self, booking):
+        """Drop a booking and re-split only the block that held it"""
+        i = bisect_right(self.starts, booking.start) - 1
+        if i < 0 or booking not in self.members[i]:
+            return False
+        remaining = [b for b in self.members[i] if b is not booking]
+        del self.starts[i], self.ends[i], self.members[i]
+        for b in remaining:
+            self.add(b)
+        return True
+
+    def is_free(self, start, end):
+        i = bisect_right(self.ends, start)
+        return i >= len(self.starts) or self.starts[i] >= end
+
+    def overlapping(self, start, end):
+        lo = bisect_right(self.ends, start)
+        hi = bisect_left(self.starts, end)
+        return [b for i in range(lo, hi) for b in self.members[i] if b.overlaps(start, end)]
+
+    def free_windows(self, start, end, min_length=timedelta(0)):
+        windows = []
+        cursor = start
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < end:
+            if self.starts[i] - cursor > min_length and self.starts[i] > cursor:
+                windows.append((cursor, self.starts[i]))
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if end - cursor > min_length and end > cursor:
+            windows.append((cursor, end))
+        return windows
+
+    def conflicts(self):
+        """All overlapping booking pairs, by sweeping each block once"""
+        pairs = []
+        for members in self.members:
+            if len(members) < 2:
+                continue
+            active = []
+            for b in sorted(members, key=lambda b: (b.start, b.end)):
+                while active and active[0][0] <= b.start:
+                    heapq.heappop(active)
+                pairs.extend((other, b) for _, _, other in active)
+                heapq.heappush(active, (b.end, id(b), b))
+        return pairs
+
+
+class Schedule:
+    """Per-resource indexes; resources are keyed 'employee:<id>' / 'equipment:<id>'"""
+
+    def __init__(self):
+        self.resources = {}
+        self.bookings = {}
+        self.names = {}
+
+    def add(self, booking):
+        self.bookings[booking.id] = booking
+        return self.resources.setdefault(booking.resource, ResourceIndex()).add(booking)
+
+    def remove(self, booking_id):
+        booking = self.bookings.pop(booking_id, None)
+        return booking is not None and self.resources[booking.resource].remove(booking)
+
+    def available(self, start, end, resource_type=None, candidates=None):
+        """Resources with nothing booked in [start, end); includes known resources with no bookings"""
+        pool = candidates or set(self.resources) | set(self.names)
+        return sorted(r for r in pool
+                      if (resource_type is None or r.startswith(resource_type + ':'))
+                      and (r not in self.resources or self.resources[r].is_free(start, end)))
+
+    def conflicts(self, start=None, end=None):
+        found = []
+        for resource in sorted(self.resources):
+            for a, b in self.resources[resource].conflicts():
+                # Filter on the overlap itself, not the span of the two bookings
+                if start and min(a.end, b.end) <= start or end and max(a.start, b.start) >= end:
+                    continue
+                found.append((resource, a, b))
+        return found
+
+    def label(self, resource):
+        return self.names.get(resource, resource)
+
+
+def to_hours(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def first_present(columns, *candidates):
+    return next((c for c in candidates if c in columns), None)
+
+
+def load_schedule(db_path=DB_PATH):
+    """Index calendar events, work orders and equipment deployments from the database"""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    schedule = Schedule()
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def rows(sql):
+        return conn.execute(sql).fetchall()
+
+    def columns(table):
+        return {r[1] for r in conn.execute(f'PRAGMA table_info({table})')}
+
+    try:
+        if 'employees' in tables:
+            name_expr = "first_name || ' ' || last_name" if 'first_name' in columns('employees') else 'name'
+            for r in rows(f'SELECT id, {name_expr} AS name FROM employees'):
+                schedule.names[f'employee:{r["id"]}'] = r['name'] or f'Employee {r["id"]}'
+        if 'equipment' in tables:
+            for r in rows('SELECT id, name FROM equipment'):
+                schedule.names[f'equipment:{r["id"]}'] = r['name'] or f'Equipment {r["id"]}'
+
+        # Work orders first, so calendar events for the same job can be recognised below
+        booked_work_orders = {}
+        if 'work_orders' in tables:
+            # createAllTables.mjs uses assigned_to/scheduled_date; initDatabase.js has employee_id.
+            # A work order books its scheduled day only: completion_date is when the job closed,
+            # not crew time, and booking the whole span would "conflict" with everything in it.
+            wo_cols = columns('work_orders')
+            employee_col = first_present(wo_cols, 'assigned_to', 'employee_id')
+            start_col = first_present(wo_cols, 'scheduled_date', 'start_date')
+            hours_col = first_present(wo_cols, 'estimated_hours')
+            if employee_col and start_col:
+                for r in rows(f'SELECT id, title, status, {employee_col} AS employee_id, {start_col} AS start_date, '
+                              f'{hours_col or "NULL"} AS estimated_hours '
+                              f'FROM work_orders WHERE {employee_col} IS NOT NULL AND {start_col} IS NOT NULL'):
+                    if (r['status'] or '').lower() in INACTIVE_STATUSES:
+                        continue
+                    start = parse_datetime(r['start_date'], f'{WORKDAY_START:02d}:00')
+                    if start is None:
+                        continue
+                    workday_end = start.replace(hour=WORKDAY_END, minute=0, second=0)
+                    end = workday_end
+                    hours = to_hours(r['estimated_hours'])
+                    if hours:
+                        # Multi-day estimates still book one workday block on the scheduled day
+                        end = start + timedelta(hours=hours)
+                        if start < workday_end:
+                            end = min(end, workday_end)
+                    if end <= start:
+                        end = start + timedelta(hours=1)
+                    resource = f'employee:{r["employee_id"]}'
+                    schedule.add(Booking(f'work_order:{r["id"]}', resource, start, end, 'work_orders', r['title']))
+                    booked_work_orders[r['id']] = resource
+
+        if 'calendar_events' in tables:
+            wo_expr = 'work_order_id' if 'work_order_id' in columns('calendar_events') else 'NULL'
+            for r in rows(f'SELECT id, title, event_date, start_time, end_time, assigned_to, status, '
+                          f'{wo_expr} AS work_order_id FROM calendar_events WHERE assigned_to IS NOT NULL'):
+                if (r['status'] or '').lower() in INACTIVE_STATUSES:
+                    continue
+                resource = f'employee:{r["assigned_to"]}'
+                # The visit for a work order already booked to this employee is that booking, not a second one
+                if r['work_order_id'] is not None and booked_work_orders.get(r['work_order_id']) == resource:
+                    continue
+                start = parse_datetime(r['event_date'], r['start_time'] or '00:00')
+                if start is None:
+                    continue
+                # end_time is free-form text from the UI; one we can't read counts as missing
+                end = parse_datetime(r['event_date'], r['end_time']) if r['end_time'] else None
+                if end is not None and end <= start:
+                    end += timedelta(days=1)
+                elif end is None:
+                    end = start + timedelta(hours=1) if r['start_time'] else start + timedelta(days=1)
+                schedule.add(Booking(f'event:{r["id"]}', resource, start, end, 'calendar_events', r['title']))
+
+        if 'equipment_logs' in tables:
+            for r in rows('SELECT id, equipment_id, deployed_date, retrieved_date, location '
+                          'FROM equipment_logs WHERE deployed_date IS NOT NULL'):
+                start = parse_datetime(r['deployed_date'])
+                if start is None:
+                    continue
+                end = parse_datetime(r['retrieved_date'], '23:59') or start + timedelta(days=OPEN_DEPLOYMENT_DAYS)
+                if end <= start:
+                    end = start + timedelta(days=1)
+                schedule.add(Booking(f'deployment:{r["id"]}', f'equipment:{r["equipment_id"]}', start, end,
+                                     'equipment_logs', r['location'] or ''))
+    finally:
+        conn.close()
+    return schedule
+
+
+def fmt(dt):
+    return dt.strftime('%Y-%m-%d %H:%M')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crew and equipment scheduling analysis')
+    parser.add_argument('--db', default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    conflicts = sub.add_parser('conflicts', help='List double-bookings')
+    conflicts.add_argument('--from', dest='start')
+    conflicts.add_argument('--to', dest='end')
+
+    available = sub.add_parser('available', help='Who/what is free between two times')
+    available.add_argument('--start', required=True)
+    available.add_argument('--end', required=True)
+    available.add_argument('--type', choices=['employee', 'equipment'])
+
+    free = sub.add_parser('free', help='Free windows for one resource')
+    free.add_argument('--resource', required=True, help='e.g. employee:3 or equipment:12')
+    free.add_argument('--start', required=True)
+    free.add_argument('--end', required=True)
+    free.add_argument('--min-hours', type=float, default=0)
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f'❌ Database not found: {args.db}', file=sys.stderr)
+        return 1
+
+    start = parse_datetime(args.start)
+    end = parse_datetime(args.end, '23:59')
+    flags = ('--from', '--to') if args.command == 'conflicts' else ('--start', '--end')
+    for flag, raw, value in zip(flags, (args.start, args.end), (start, end)):
+        if raw and value is None:
+            print(f'❌ Invalid {flag} "{raw}": use YYYY-MM-DD or "YYYY-MM-DD HH:MM"', file=sys.stderr)
+            return 1
+    if start and end and end <= start:
+        print(f'❌ {flags[1]} must be after {flags[0]}', file=sys.stderr)
+        return 1
+    schedule = load_schedule(args.db)
+
+    if args.command == 'conflicts':
+        found = schedule.conflicts(start, end)
+        for resource, a, b in found:
+            print(f'⚠️  {schedule.label(resource)}: {a.source} "{a.label}" {fmt(a.start)}–{fmt(a.end)} '
+                  f'overlaps {b.source} "{b.label}" {fmt(b.start)}–{fmt(b.end)}')
+        print(f'\n{len(found)} conflicts across {len(schedule.resources)} scheduled resources')
+    elif args.command == 'available':
+        free_now = schedule.available(start, end, args.type)
+        print(f'✅ Available {fmt(start)}–{fmt(end)}:')
+        for resource in free_now:
+            print(f'   {resource:<16} {schedule.label(resource)}')
+    elif args.command == 'free':
+        index = schedule.resources.get(args.resource, ResourceIndex())
+        print(f'📅 Free windows for {schedule.label(args.resource)}:')
+        for a, b in index.free_windows(start, end, timedelta(hours=args.min_hours)):
+            print(f'   {fmt(a)} – {fmt(b)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
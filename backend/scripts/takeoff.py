@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Batch Quantity Takeoff
+Turns room geometry for a whole job into priced line items: wall/ceiling/floor
+SF, perimeter LF, roofing squares and cubic yards are computed column-wise for
+every room at once, then mapped onto price list codes in bulk.
+
+Job file (JSON):
+    {
+      "rooms": [
+        {"name": "Kitchen", "length": 14, "width": 12, "height": 8,
+         "openings": [{"width": 3, "height": 6.67, "count": 2}],
+         "pitch": "6/12", "depth_in": 4}
+      ],
+      "items": [
+        {"code": "DRY-001", "measure": "wall_sf", "waste": 0.10},
+        {"code": "PNT-004", "measure": "paint_gal", "rooms": ["Kitchen"]}
+      ]
+    }
+
+Rooms may also come from a CSV (--rooms-csv) with columns
+name,length,width,height[,openings_sf,openings_count,pitch,depth_in].
+
+Usage:
+    python3 takeoff.py job.json -o takeoff.csv
+    python3 takeoff.py job.json --estimate-id 42
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sqlite3
+import sys
+from collections import OrderedDict
+
+DB_PATH = os.environ.get('DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'bcs-database.db'))
+
+PAINT_COVERAGE_SF_PER_GAL = 350.0
+
+# Measure name -> price list unit it is expressed in
+MEASURE_UNITS = OrderedDict([
+    ('floor_sf', 'SF'),
+    ('ceiling_sf', 'SF'),
+    ('wall_sf', 'SF'),
+    ('wall_ceiling_sf', 'SF'),
+    ('perimeter_lf', 'LF'),
+    ('roof_sq', 'SQ'),
+    ('volume_cy', 'CY'),
+    ('depth_cy', 'CY'),
+    ('openings_ea', 'EA'),
+    ('room_ea', 'EA'),
+    ('paint_gal', 'GAL'),
+])
+
+
+def parse_pitch(pitch):
+    """'6/12' or 6 -> slope multiplier for roof area (1.0 for flat)"""
+    if pitch in (None, ''):
+        return 1.0
+    rise = float(str(pitch).split('/')[0])
+    return math.sqrt(1 + (rise / 12.0) ** 2)
+
+
+def load_rooms_csv(path):
+    rooms = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            rooms.append({
+                'name': row['name'],
+                'length': row['length'],
+                'width': row['width'],
+                'height': row.get('height') or 0,
+                'openings_sf': row.get('openings_sf') or 0,
+                'openings_count': row.get('openings_count') or 0,
+                'pitch': row.get('pitch') or None,
+                'depth_in': row.get('depth_in') or 0,
+            })
+    return rooms
+
+
+def normalize_rooms(rooms):
+    """Convert each room's dimensions to numbers, naming the room in any error"""
+    normalized, errors = [], []
+    for n, r in enumerate(rooms, 1):
+        name = r.get('name') or f'room #{n}'
+        problems = []
+
+        def number(field, value, required=False, cast=float):
+            if value in (None, ''):
+                if required:
+                    problems.append(f'{field} is missing')
+                return 0
+            try:
+                return cast(value)
+            except (TypeError, ValueError):
+                problems.append(f'{field} is not a number ({value!r})')
+                return 0
+
+        room = {
+            'length': number('length', r.get('length'), required=True),
+            'width': number('width', r.get('width'), required=True),
+            'height': number('height', r.get('height')),
+            'depth_in': number('depth_in', r.get('depth_in')),
+            'openings_sf': number('openings_sf', r.get('openings_sf')),
+            'openings_ea': number('openings_count', r.get('openings_count')),
+        }
+        try:
+            room['slope'] = parse_pitch(r.get('pitch'))
+        except ValueError:
+            problems.append(f'pitch is not a rise/12 value ({r.get("pitch")!r})')
+        for o in r.get('openings') or []:
+            count = number('opening count', o.get('count', 1), cast=int)
+            room['openings_sf'] += number('opening width', o.get('width'), required=True) \
+                * number('opening height', o.get('height'), required=True) * count
+            room['openings_ea'] += count
+
+        if problems:
+            errors.append(f'room "{name}": ' + '; '.join(problems))
+        normalized.append(room)
+    if errors:
+        raise ValueError('Invalid room geometry:\n  ' + '\n  '.join(errors))
+    return normalized
+
+
+def compute_measures(rooms):
+    """Compute every measure for every room; returns {measure: [value per room]}"""
+    rooms = normalize_rooms(rooms)
+    length = [r['length'] for r in rooms]
+    width = [r['width'] for r in rooms]
+    height = [r['height'] for r in rooms]
+    depth_in = [r['depth_in'] for r in rooms]
+    slope = [r['slope'] for r in rooms]
+    openings_sf = [r['openings_sf'] for r in rooms]
+    openings_ea = [r['openings_ea'] for r in rooms]
+
+    floor = [l * w for l, w in zip(length, width)]
+    perimeter = [2 * (l + w) for l, w in zip(length, width)]
+    wall = [max(p * h - o, 0.0) for p, h, o in zip(perimeter, height, openings_sf)]
+    wall_ceiling = [w + c for w, c in zip(wall, floor)]
+
+    return {
+        'floor_sf': floor,
+        'ceiling_sf': list(floor),
+        'wall_sf': wall,
+        'wall_ceiling_sf': wall_ceiling,
+        'perimeter_lf': perimeter,
+        'roof_sq': [f * s / 100.0 for f, s in zip(floor, slope)],
+        'volume_cy': [f * h / 27.0 for f, h in zip(floor, height)],
+        'depth_cy': [f * d / 324.0 for f, d in zip(floor, depth_in)],
+        'openings_ea': openings_ea,
+        'room_ea': [1.0] * len(rooms),
+        'paint_gal': [wc / PAINT_COVERAGE_SF_PER_GAL for wc in wall_ceiling],
+    }
+
+
+def load_price_items(codes, db_path=DB_PATH):
+    """Fetch the price list rows for all requested codes in one query"""
+    if not codes:
+        return {}
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        placeholders = ', '.join('?' * len(codes))
+        rows = conn.execute(
+            f'SELECT xactimate_code, item_name, category, unit, unit_price '
+            f'FROM price_list WHERE xactimate_code IN ({placeholders})',
+            list(codes)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row['xactimate_code']: dict(row) for row in rows}
+
+
+def run_takeoff(rooms, items, price_items):
+    """Map measures onto price list items; returns a list of line item dicts"""
+    measures = compute_measures(rooms)
+    names = [r.get('name') or f'room #{n}' for n, r in enumerate(rooms, 1)]
+    index = {name: i for i, name in enumerate(names)}
+
+    errors = []
+    for item in items:
+        code = item['code']
+        measure = item['measure']
+        if measure not in MEASURE_UNITS:
+            errors.append(f'{code}: unknown measure "{measure}"')
+            continue
+        price = price_items.get(code)
+        if price is None and item.get('unit_price') in (None, ''):
+            errors.append(f'{code}: not found in price list')
+            continue
+        unit = (price or {}).get('unit') or item.get('unit') or MEASURE_UNITS[measure]
+        if unit.upper() != MEASURE_UNITS[measure]:
+            errors.append(f'{code}: priced per {unit} but measure {measure} is {MEASURE_UNITS[measure]}')
+        for name in item.get('rooms') or []:
+            if name not in index:
+                errors.append(f'{code}: unknown room "{name}"')
+        for field in ('waste', 'unit_price'):
+            if item.get(field) not in (None, ''):
+                try:
+                    float(item[field])
+                except (TypeError, ValueError):
+                    errors.append(f'{code}: {field} is not a number ({item[field]!r})')
+    if errors:
+        raise ValueError('Invalid takeoff mapping:\n  ' + '\n  '.join(errors))
+
+    line_items = []
+    for item in items:
+        code = item['code']
+        price = price_items.get(code) or {}
+        unit_price = float(item['unit_price'] if item.get('unit_price') not in (None, '')
+                           else price.get('unit_price') or 0)
+        factor = 1.0 + float(item.get('waste') or 0)
+        values = measures[item['measure']]
+        selected = [index[n] for n in item['rooms']] if item.get('rooms') else range(len(rooms))
+
+        for i in selected:
+            quantity = round(values[i] * factor, 2)
+            if quantity <= 0:
+                continue
+            line_items.append({
+                'room': names[i],
+                'code': code,
+                'description': item.get('description') or price.get('item_name') or code,
+                'category': price.get('category') or item.get('category'),
+                'measure': item['measure'],
+                'quantity': quantity,
+                'unit': MEASURE_UNITS[item['measure']],
+                'unit_price': unit_price,
+                'total_price': round(quantity * unit_price, 2),
+            })
+    return line_items
+
+
+def write_csv(line_items, out):
+    fields = ['room', 'code', 'description', 'category', 'measure', 'quantity', 'unit', 'unit_price', 'total_price']
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(line_items)
+
+
+def save_to_estimate(line_items, estimate_id, db_path=DB_PATH):
+    """Insert line items in one transaction and recalculate totals like routes/estimates.mjs"""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute('SELECT tax_rate FROM estimates WHERE id = ?', (estimate_id,)).fetchone()
+        if row is None:
+            raise ValueError(f'Estimate {estimate_id} not found')
+        tax_rate = row[0] or 0
+        with conn:
+            start = conn.execute(
+                'SELECT COALESCE(MAX(sort_order), 0) FROM line_items WHERE estimate_id = ?', (estimate_id,)
+            ).fetchone()[0]
+            conn.executemany(
+                '''INSERT INTO line_items (estimate_id, category, code, description, quantity, unit, unit_price, total_price, notes, sort_order)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                [(estimate_id, li['category'] or 'custom', li['code'], li['description'], li['quantity'], li['unit'],
+                  li['unit_price'], li['total_price'], f"Takeoff: {li['room']} ({li['measure']})", start + n)
+                 for n, li in enumerate(line_items, 1)]
+            )
+            subtotal = conn.execute(
+                'SELECT COALESCE(SUM(total_price), 0) FROM line_items WHERE estimate_id = ?', (estimate_id,)
+            ).fetchone()[0]
+            tax_amount = subtotal * (tax_rate / 100)
+            conn.execute(
+                '''UPDATE estimates
+                   SET subtotal = ?, tax_amount = ?, total_amount = ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?''',
+                (subtotal, tax_amount, subtotal + tax_amount, estimate_id)
+            )
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch quantity takeoff from room geometry')
+    parser.add_argument('job', help='Job JSON with "rooms" and "items"')
+    parser.add_argument('--rooms-csv', help='Load rooms from CSV instead of the job file')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('-o', '--output', help='CSV output path (default: stdout)')
+    parser.add_argument('--estimate-id', type=int, help='Append the line items to this estimate')
+    args = parser.parse_args(argv)
+
+    with open(args.job, encoding='utf-8') as f:
+        job = json.load(f)
+    rooms = load_rooms_csv(args.rooms_csv) if args.rooms_csv else job.get('rooms', [])
+    items = job.get('items', [])
+
+    codes = sorted({item['code'] for item in items})
+    price_items = load_price_items(codes, args.db) if os.path.exists(args.db) else {}
+
+    try:
+        line_items = run_takeoff(rooms, items, price_items)
+    except ValueError as error:
+        print(f'❌ {error}', file=sys.stderr)
+        return 1
+
+    if args.estimate_id is not None:
+        try:
+            save_to_estimate(line_items, args.estimate_id, args.db)
+        except ValueError as error:
+            print(f'❌ {error}', file=sys.stderr)
+            return 1
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as out:
+            write_csv(line_items, out)
+    elif args.estimate_id is None:
+        write_csv(line_items, sys.stdout)
+
+    totals = OrderedDict()
+    for li in line_items:
+        qty, total = totals.get(li['code'], (0.0, 0.0))
+        totals[li['code']] = (qty + li['quantity'], total + li['total_price'])
+    print(f'\n📐 {len(rooms)} rooms → {len(line_items)} line items', file=sys.stderr)
+    for code, (qty, total) in totals.items():
+        print(f'   {code}: {qty:,.2f} → ${total:,.2f}', file=sys.stderr)
+    print(f'💰 Total: ${sum(t for _, t in totals.values()):,.2f}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
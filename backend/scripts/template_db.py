@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Template database builder and cloner
+Builds a fully seeded, indexed and analyzed SQLite template once, keyed on a
+hash of the schema/seed inputs, and stamps out new databases from it by file
+copy (or VACUUM INTO) - for test fixtures and new-tenant provisioning.
+
+Usage:
+    python3 template_db.py build
+    python3 template_db.py clone ../database/tenant-42.db
+    python3 template_db.py clone-many /tmp/test-dbs --count 32 --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPTS_DIR)
+TEMPLATE_DIR = os.environ.get('BCS_TEMPLATE_DIR', os.path.join(BACKEND_DIR, 'database', 'templates'))
+
+# Schema first, then the 2000+ item price list seed. Both honor DB_PATH.
+DEFAULT_STEPS = [
+    os.path.join(SCRIPTS_DIR, 'initDatabase.js'),
+    os.path.join(SCRIPTS_DIR, 'seed2000PlusXactimateItems.js'),
+]
+
+# Indexes for the columns the routes filter and sort on. The schema scripts only
+# create UNIQUE autoindexes; entries whose table or columns are missing are skipped.
+TEMPLATE_INDEXES = [
+    ('idx_price_list_category_name', 'price_list', ('category', 'item_name')),
+    ('idx_work_orders_client', 'work_orders', ('client_id',)),
+    ('idx_work_orders_status', 'work_orders', ('status',)),
+    ('idx_invoices_client', 'invoices', ('client_id',)),
+    ('idx_invoices_work_order', 'invoices', ('work_order_id',)),
+    ('idx_estimates_client', 'estimates', ('client_id',)),
+    ('idx_payments_invoice', 'payments', ('invoice_id',)),
+    ('idx_line_items_estimate', 'line_items', ('estimate_id', 'sort_order')),
+    ('idx_xactimate_line_items_estimate', 'xactimate_line_items', ('estimate_id',)),
+]
+
+# Bump when the way templates are finalized changes, so old ones are rebuilt
+TEMPLATE_FORMAT = 2
+
+
+def template_key(steps):
+    """Hash the build inputs: step names and contents, plus the SQLite version"""
+    h = hashlib.sha256()
+    h.update(f'format={TEMPLATE_FORMAT};sqlite={sqlite3.sqlite_version}\n'.encode())
+    for step in steps:
+        h.update(os.path.basename(step).encode() + b'\0')
+        with open(step, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        h.update(b'\0')
+    return h.hexdigest()[:16]
+
+
+def template_path(steps, template_dir=TEMPLATE_DIR):
+    return os.path.join(template_dir, f'bcs-template-{template_key(steps)}.db')
+
+
+def run_step(step, db_path):
+    """Apply one build step: .sql files are executed directly, .js/.mjs run under node"""
+    if step.endswith('.sql'):
+        with open(step, encoding='utf-8') as f:
+            sql = f.read()
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.executescript(sql)
+            conn.commit()
+        finally:
+            conn.close()
+    elif step.endswith(('.js', '.mjs')):
+        env = dict(os.environ, DB_PATH=db_path)
+        result = subprocess.run(['node', step], cwd=BACKEND_DIR, env=env,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            output = (result.stderr or result.stdout).strip()
+            raise RuntimeError(f'{os.path.basename(step)} failed (exit {result.returncode})'
+                               + (f':\n{output}' if output else ''))
+    else:
+        raise ValueError(f'Unsupported build step: {step}')
+
+
+def create_indexes(conn):
+    """Create TEMPLATE_INDEXES for the tables and columns this schema has; returns names created"""
+    created = []
+    for name, table, columns in TEMPLATE_INDEXES:
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if not existing or not set(columns) <= existing:
+            continue
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table}({", ".join(columns)})')
+        created.append(name)
+    return created
+
+
+def finalize_template(db_path):
+    """Index, analyze and compact the template so every clone starts with fresh stats"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode=DELETE')
+        create_indexes(conn)
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA optimize')
+        conn.execute('VACUUM')
+        check = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        if check != 'ok':
+            raise RuntimeError(f'Template integrity check failed: {check}')
+    finally:
+        conn.close()
+
+
+def build_template(steps=None, template_dir=TEMPLATE_DIR, force=False):
+    """Return the path of the template for these steps, building it if missing"""
+    steps = steps or DEFAULT_STEPS
+    path = template_path(steps, template_dir)
+    if os.path.exists(path) and not force:
+        return path
+
+    os.makedirs(template_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.building-', suffix='.db', dir=template_dir)
+    os.close(fd)
+    os.unlink(tmp_path)
+    try:
+        for step in steps:
+            print(f'  ▸ {os.path.basename(step)}')
+            run_step(step, tmp_path)
+        finalize_template(tmp_path)
+        # Atomic publish: concurrent builders race harmlessly on identical content
+        os.replace(tmp_path, path)
+    finally:
+        for leftover in (tmp_path, tmp_path + '-journal', tmp_path + '-wal', tmp_path + '-shm'):
+            if os.path.exists(leftover):
+                os.unlink(leftover)
+    return path
+
+
+def clone_database(template, dest, method='copy'):
+    """Stamp out one database from the template; written to a temp name, then renamed"""
+    dest_dir = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(dest_dir, exist_ok=True)
+    tmp_dest = f'{dest}.tmp-{os.getpid()}'
+    if method == 'copy':
+        shutil.copyfile(template, tmp_dest)
+    elif method == 'vacuum':
+        conn = sqlite3.connect(f'file:{template}?mode=ro', uri=True)
+        try:
+            conn.execute('VACUUM INTO ?', (tmp_dest,))
+        finally:
+            conn.close()
+    else:
+        raise ValueError(f'Unknown clone method: {method}')
+    os.replace(tmp_dest, dest)
+    return dest
+
+
+def clone_many(template, dest_dir, count, workers=None, method='copy', prefix='bcs-test'):
+    """Clone `count` databases in parallel (e.g. one per test worker)"""
+    os.makedirs(dest_dir, exist_ok=True)
+    targets = [os.path.join(dest_dir, f'{prefix}-{i:03d}.db') for i in range(count)]
+    workers = workers or min(count, (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda t: clone_database(template, t, method), targets))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and clone seeded BCS template databases')
+    parser.add_argument('--step', action='append', dest='steps',
+                        help='Build step (.js/.mjs/.sql), repeatable; defaults to schema + 2000 item seed')
+    parser.add_argument('--template-dir', default=TEMPLATE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='Build the template if it is not already cached')
+    build.add_argument('--force', action='store_true', help='Rebuild even if cached')
+
+    clone = sub.add_parser('clone', help='Clone the template to a single database file')
+    clone.add_argument('dest')
+    clone.add_argument('--method', choices=['copy', 'vacuum'], default='copy')
+
+    many = sub.add_parser('clone-many', help='Clone N isolated databases in parallel')
+    many.add_argument('dest_dir')
+    many.add_argument('--count', type=int, default=os.cpu_count() or 4)
+    many.add_argument('--workers', type=int)
+    many.add_argument('--method', choices=['copy', 'vacuum'], default='copy')
+    many.add_argument('--prefix', default='bcs-test')
+
+    args = parser.parse_args(argv)
+    steps = [os.path.abspath(s) for s in args.steps] if args.steps else DEFAULT_STEPS
+
+    started = time.perf_counter()
+    force = getattr(args, 'force', False)
+    cached = os.path.exists(template_path(steps, args.template_dir)) and not force
+    if not cached:
+        print('🔧 Building template database...')
+    try:
+        template = build_template(steps, args.template_dir, force=force)
+    except (RuntimeError, ValueError, OSError) as error:
+        print(f'❌ {error}', file=sys.stderr)
+        return 1
+    print(f'📍 Template: {template} ({"cached" if cached else "built"} in {time.perf_counter() - started:.2f}s)')
+
+    if args.command == 'clone':
+        started = time.perf_counter()
+        clone_database(template, args.dest, args.method)
+        print(f'✅ Cloned to {args.dest} in {time.perf_counter() - started:.3f}s')
+    elif args.command == 'clone-many':
+        started = time.perf_counter()
+        paths = clone_many(template, args.dest_dir, args.count, args.workers, args.method, args.prefix)
+        print(f'✅ Cloned {len(paths)} databases into {args.dest_dir} in {time.perf_counter() - started:.3f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())